@@ -1,30 +1,83 @@
+from bisect import bisect_right
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass
+from functools import cached_property
+from itertools import accumulate
 
 type OrderedSet = dict[str, None]
 
 def ordered_set(value: str) -> OrderedSet:
     return {value: None}
 
+class ExpectedUnion(Mapping[str, None]):
+    '''The union of the expectations of several failed alternatives, in order.
+
+    Parsing backtracks a lot, and most of these are discarded, so they are only merged when inspected.'''
+
+    __slots__ = ('parts', '_merged')
+
+    def __init__(self, parts: list['OrderedSet | ExpectedUnion']) -> None:
+        self.parts = parts
+        self._merged: OrderedSet | None = None
+
+    def merged(self) -> OrderedSet:
+        if self._merged is None:
+            merged = {}
+            for part in self.parts:
+                merged |= part
+            self._merged = merged
+            self.parts = []
+        return self._merged
+
+    def __getitem__(self, key: str) -> None:
+        return self.merged()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.merged())
+
+    def __len__(self) -> int:
+        return len(self.merged())
+
+    def __or__(self, other: 'OrderedSet | ExpectedUnion') -> OrderedSet:
+        return self.merged() | dict(other)
+
+    def __ror__(self, other: OrderedSet) -> OrderedSet:
+        return other | self.merged()
+
+    def __repr__(self) -> str:
+        return repr(self.merged())
+
 @dataclass(frozen=True)
 class SourceLocation:
     string: str
     index: int
 
     @classmethod
-    def from_source(cls, s: 'Source'):
+    def from_source(cls, s: 'Source | SourceLocation'):
+        if isinstance(s, SourceLocation):
+            # already immutable, so it can be shared
+            return s
         return cls(s.string, s.index)
 
     def get_line_info(self) -> tuple[int, int, str]:
-        line_nr = self.string.count('\n', 0, self.index)
-        if line_nr:
-            line_start = self.string.rfind('\n', 0, self.index) + 1
-        else:
-            line_start = 0
-        line_end: int | None = self.string.find('\n', self.index)
-        if line_end == -1:
-            line_end = None
-        column_nr = self.index - line_start
-        return line_nr + 1, column_nr, self.string[line_start:line_end]
+        # Only call this when reporting an error, never while parsing: the parser creates
+        # many SourceLocations for failures it recovers from.
+        line_starts = self._line_starts
+        line_index = bisect_right(line_starts, self.index) - 1
+        if line_index == len(line_starts) - 1:
+            # just past the implicit newline that ends every document
+            return line_index + 1, 0, ''
+        line_start = line_starts[line_index]
+        line_end = line_starts[line_index + 1] - 1
+        return line_index + 1, self.index - line_start, self.string[line_start:line_end]
+
+    @cached_property
+    def _line_starts(self) -> list[int]:
+        # The start of each line, plus one past the implicit final newline.
+        # Kept with the location rather than in a global cache, so it is freed along with the error.
+        return list(accumulate((len(line) + 1 for line in self.string.split('\n')), initial=0))
+
+_MAX_LINE_LENGTH = 200
 
 @dataclass
 class KyssError(Exception):
@@ -41,6 +94,13 @@ class KyssError(Exception):
 
     def __str__(self) -> str:
         line_nr, col, line = self.source.get_line_info()
+        if len(line) > _MAX_LINE_LENGTH:
+            # only show the part of a very long line around the error
+            start = max(0, min(col - _MAX_LINE_LENGTH // 2, len(line) - _MAX_LINE_LENGTH))
+            end = start + _MAX_LINE_LENGTH
+            prefix = '...' if start > 0 else ''
+            line = prefix + line[start:end] + ('...' if end < len(line) else '')
+            col += len(prefix) - start
         spaces = ' ' * (col - 1)
         return f'Expected {self.format_expected()} at line {line_nr}:\n{line}\n{spaces}^'
 
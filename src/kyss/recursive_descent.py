@@ -1,23 +1,43 @@
 import re
 import sys
-from dataclasses import dataclass, replace
-from functools import partial
+from functools import lru_cache, wraps
 from pathlib import Path
 from typing import Any, Callable, Literal, Never, Self
 
 from .ast import MappingNode, Node, ScalarNode, SequenceNode
-from .errors import KyssSyntaxError, OrderedSet, SourceLocation, ordered_set
+from .errors import (ExpectedUnion, KyssSyntaxError, OrderedSet, SourceLocation,
+                     ordered_set)
 
 _PENDING = object()
 
-@dataclass(frozen=True)
 class Source:
+    __slots__ = ('string', 'length', 'index', 'indentation', 'memo')
+
     string: str
-    index: int = 0
-    indentation: tuple[str | Literal[_PENDING], ...] = ('',)
+    length: int
+    index: int
+    indentation: list[str | Literal[_PENDING]]
+    #: packrat memo, see :func:`memoized`
+    memo: dict[tuple[Callable, int], tuple[Any, ...]]
+
+    def __init__(self, string: str, index: int = 0, indentation: list[str | Literal[_PENDING]] | None = None) -> None:
+        self.string = string
+        self.length = len(string)
+        self.index = index
+        self.indentation = [''] if indentation is None else indentation
+        self.memo = {}
+
+    def save(self) -> tuple[int, int, str | Literal[_PENDING]]:
+        return self.index, len(self.indentation), self.indentation[-1]
+
+    def restore(self, saved: tuple[int, int, str | Literal[_PENDING]]) -> None:
+        self.index, depth, last_indentation = saved
+        del self.indentation[depth:]
+        self.indentation[-1] = last_indentation
 
     def advance_to(self, index: int) -> Self:
-        return replace(self, index=index)
+        self.index = index
+        return self
 
     def advance(self, count: int) -> Self:
         return self.advance_to(self.index + count)
@@ -36,90 +56,211 @@ class Source:
             self.fail(expected or str(regex))
         return match_value, self.advance_to(match_value.end())
 
-    def check(self, expected: str) -> bool:
-        return self.string.startswith(expected, self.index)
+    # expect, and a check without consuming, specialized for the single characters most of the grammar is made of
+    def check_char(self, expected: str) -> bool:
+        return self.index < self.length and self.string[self.index] == expected
+
+    def expect_char(self, expected: str) -> Self:
+        if not (self.index < self.length and self.string[self.index] == expected):
+            self.fail(repr(expected))
+        self.index += 1
+        return self
 
     def indent(self, specific_indentation: str | None = None) -> Self:
         if specific_indentation is not None:
-            new_indentation = self.indentation[-1] + specific_indentation
+            self.indentation.append(self.indentation[-1] + specific_indentation)
         else:
-            new_indentation = _PENDING
-        return replace(self, indentation=self.indentation + (new_indentation,))
+            self.indentation.append(_PENDING)
+        return self
 
     def dedent(self) -> Self:
         assert self.indentation
-        return replace(self, indentation=self.indentation[:-1])
+        self.indentation.pop()
+        return self
 
     def fix_indentation(self, new_indentation: str) -> Self:
         if not new_indentation.startswith(self.indentation[-2]):
             self.fail('inconsistent indentation')
-        return replace(self, indentation=self.indentation[:-1] + (new_indentation,))
+        self.indentation[-1] = new_indentation
+        return self
 
 type Consumer[T] = Callable[[Source], tuple[T, Source]]
+type TryConsumer[T] = Callable[[Source], tuple[T, Source] | None]
 
 def first_valid[T](source: Source, alternatives: list[Consumer[T]]) -> tuple[T, Source]:
-    exp = {}
+    failed = []
+    saved = source.save()
     for alternative in alternatives:
         try:
             return alternative(source)
         except KyssSyntaxError as e:
-            exp |= e.expected
-    raise KyssSyntaxError(SourceLocation.from_source(source), exp)
+            source.restore(saved)
+            failed.append(e.expected)
+    raise KyssSyntaxError(SourceLocation.from_source(source), ExpectedUnion(failed))
+
+
+def first_valid_from[T](source: Source, alternatives: list[Consumer[T]], start: int) -> tuple[T, Source]:
+    # Like first_valid, for when the caller has peeked ahead and knows the alternatives before
+    # start cannot succeed. Those are only tried if everything else fails, to report what they expected.
+    failed = []
+    saved = source.save()
+    for alternative in alternatives[start:]:
+        try:
+            return alternative(source)
+        except KyssSyntaxError as e:
+            source.restore(saved)
+            failed.append(e.expected)
+    skipped = []
+    for alternative in alternatives[:start]:
+        try:
+            alternative(source)
+        except KyssSyntaxError as e:
+            skipped.append(e.expected)
+        else:
+            assert False  # unreachable
+        source.restore(saved)
+    raise KyssSyntaxError(SourceLocation.from_source(source), ExpectedUnion(skipped + failed))
+
+
+def memoized[T](parser: Consumer[T]) -> Consumer[T]:
+    # Packrat memoization, keyed on position only: only use this for parsers that neither
+    # depend on nor change the indentation stack.
+    @wraps(parser)
+    def memoized_parser(source: Source) -> tuple[T, Source]:
+        key = (parser, source.index)
+        entry = source.memo.get(key)
+        if entry is not None:
+            value, end, failure = entry
+            if failure is not None:
+                raise KyssSyntaxError(*failure)
+            return value, source.advance_to(end)
+        try:
+            value, source = parser(source)
+        except KyssSyntaxError as e:
+            source.memo[key] = (None, None, (e.source, e.expected))
+            raise
+        source.memo[key] = (value, source.index, None)
+        return value, source
+    return memoized_parser
 
 
 def n_or_more[T](source: Source, repeated: Consumer[T], minimum: int) -> tuple[list[T], Source]:
+    # Not used by the grammar itself any more, which uses zero_or_more, but kept as a combinator
+    # for parsers built on this module.
     parsed = []
     try:
         while True:
+            saved = source.save()
             value, source = repeated(source)
             parsed.append(value)
     except KyssSyntaxError as e:
+        source.restore(saved)
         expected = e.format_expected()
     if len(parsed) < minimum:
         source.fail(f'At least {minimum} times {expected}')
     return parsed, source
 
 
-def composed_parsers[T](parsers: list[Consumer[T]], select: int, source: Source) -> tuple[list[T] | T, Source]:
-    assert 0 <= select < len(parsers)
-    for i, parser in enumerate(parsers):
-        parsed_item, source = parser(source)
-        if i == select:
-            parsed = parsed_item
+def zero_or_more[T](source: Source, repeated: TryConsumer[T], parsed: list[T] | None = None) -> tuple[list[T], Source]:
+    # like n_or_more, but repeated signals failure by returning None instead of raising
+    # if given, parsed is extended in place, to avoid copying already parsed items
+    if parsed is None:
+        parsed = []
+    while (result := repeated(source)) is not None:
+        value, source = result
+        parsed.append(value)
     return parsed, source
 
 
-def compose[T](parsers: list[Consumer[T | Any]], *, select: int) -> Consumer[T | list[T]]:
-    return partial(composed_parsers, parsers, select)
+def try_compose[T](parsers: list[Consumer[T | Any] | TryConsumer[T | Any]], *, select: int) -> TryConsumer[T | list[T]]:
+    # Runs the parsers in sequence and returns what the one at select parsed. Returns None if any of
+    # the parsers fails, restoring the source. The parsers can signal failure either by returning None
+    # or by raising.
+    # Partially evaluated into straight-line code, instead of looping over the list of parsers on every call.
+    assert 0 <= select < len(parsers)
+    lines = ['def composed(source):',
+             '    saved = source.save()',
+             '    try:']
+    for i in range(len(parsers)):
+        target = 'parsed' if i == select else '_'
+        lines += [f'        result = parser_{i}(source)',
+                  '        if result is None:',
+                  '            source.restore(saved)',
+                  '            return None',
+                  f'        {target}, source = result']
+    lines += ['    except KyssSyntaxError:',
+              '        source.restore(saved)',
+              '        return None',
+              '    return parsed, source']
+    namespace: dict[str, Any] = {f'parser_{i}': parser for i, parser in enumerate(parsers)}
+    namespace['KyssSyntaxError'] = KyssSyntaxError
+    exec('\n'.join(lines), namespace)
+    return namespace['composed']
 
 
 def expect_regex_factory(regex: str, expectation: str) -> Consumer[str]:
-    c = re.compile(regex)
+    # The generic path, for terminals that are off the hot path: the hot ones call bound match methods directly.
+    pattern = re.compile(regex)
     def f(s: Source) -> tuple[str, Source]:
-        match, s = s.match(c, expectation)
+        match, s = s.match(pattern, expectation)
         return match.group(), s
     return f
 
 indentation = re.compile(r'[ \t]*')
+_INDENT_MATCH = indentation.match
+
+@lru_cache(maxsize=128)
+def _indentation_matcher(level: str) -> Callable[[str, int], re.Match[str] | None]:
+    # matches exactly this indentation, and no more
+    return re.compile(re.escape(level) + r'(?![ \t])').match
+
 def expect_indentation(s: Source) -> tuple[None, Source]:
-    match, snew = s.match(indentation)
-    indentation_found = match.group()
-    if s.indentation[-1] is _PENDING:
-        return None, snew.fix_indentation(indentation_found)
-    if indentation_found == s.indentation[-1]:
-        return None, snew
-    s.fail('more indentation')
+    start = s.index
+    current = s.indentation[-1]
+    if current is _PENDING:
+        indentation_found = _INDENT_MATCH(s.string, start).group()
+        s.index = start + len(indentation_found)
+        return None, s.fix_indentation(indentation_found)
+    if _indentation_matcher(current)(s.string, start) is None:
+        s.fail('more indentation')
+    s.index = start + len(current)
+    return None, s
+
+def try_indentation(s: Source) -> tuple[None, Source] | None:
+    start = s.index
+    current = s.indentation[-1]
+    if current is _PENDING:
+        indentation_found = _INDENT_MATCH(s.string, start).group()
+        if not indentation_found.startswith(s.indentation[-2]):
+            return None
+        s.indentation[-1] = current = indentation_found
+    elif _indentation_matcher(current)(s.string, start) is None:
+        return None
+    s.index = start + len(current)
+    return None, s
 
 plain_re = re.compile(r'(?!-[ \t]|[\'" \t])(:[^ \t\n]|[^ \t\n]#|[^:#\n])+')
+_PLAIN_MATCH = plain_re.match
 def expect_plain_scalar(s: Source) -> tuple[str, Source]:
-    # Can't use expect_regex_factory here, because rstrip is needed
-    match, s = s.match(plain_re, 'plain scalar')
+    # Can't use expect_regex_factory here, because rstrip is needed.
+    # Folding the rstrip into plain_re was measured to be no faster (rstrip returns the
+    # string itself when there is nothing to strip), and a regex can't strip exactly the
+    # same characters: rstrip also removes a trailing \r from a ':\r' pair.
+    match = _PLAIN_MATCH(s.string, s.index)
+    if match is None:
+        s.fail('plain scalar')
+    s.index = match.end()
     return match.group().rstrip(), s
 
 esc_seq_re = re.compile((r"\\(x[a-fA-F0-9]{2}|u[a-fA-F0-9]{4}|U[a-fA-F0-9]{8}|.)"))
+_ESC_SEQ_MATCH = esc_seq_re.match
 SIMPLE: dict[str, str] = {'n': '\n', 't': '\t', 'r': '\r'}
 def expect_escape_sequence(s: Source) -> tuple[str, Source]:
-    match, snew = s.match(esc_seq_re, 'escape sequence')
+    start = s.index
+    match = _ESC_SEQ_MATCH(s.string, start)
+    if match is None:
+        s.fail('escape sequence')
+    s.index = match.end()
     escaped = match.group(1)
     selector = escaped[0]
     if selector in {'\\', '"', "'"}:
@@ -129,129 +270,221 @@ def expect_escape_sequence(s: Source) -> tuple[str, Source]:
     elif selector in {'x', 'u', 'U'}:
         value = chr(int(escaped[1:], 16))
     else:
-        s.fail('valid escape sequence')
-    return value, snew
+        s.advance_to(start).fail('valid escape sequence')
+    return value, s
 
 expect_double_quoted_contents = expect_regex_factory(r'[^"\n\\]+', 'double quoted string contents')
 
+_DOUBLE_QUOTED_FRAGMENTS = [expect_double_quoted_contents, expect_escape_sequence]
+_DQ_FAST_MATCH = re.compile(r'"([^"\n\\]*)"').match
+
 def expect_double_quoted_scalar(s: Source) -> tuple[str, Source]:
-    s = s.expect('"')
+    # fast path for strings without escape sequences
+    if (match := _DQ_FAST_MATCH(s.string, s.index)) is not None:
+        s.index = match.end()
+        return match.group(1), s
+    s = s.expect_char('"')
     frags = []
     frag: str
-    while not s.check('"'):
-        frag, s = first_valid(s, [expect_double_quoted_contents, expect_escape_sequence])
+    while not s.check_char('"'):
+        frag, s = first_valid(s, _DOUBLE_QUOTED_FRAGMENTS)
         frags.append(frag)
-    return ''.join(frags), s.expect('"')
+    return ''.join(frags), s.expect_char('"')
 
 expect_single_quoted_contents = expect_regex_factory(r"[^'\n\\]+", 'single quoted string contents')
 
+_SINGLE_QUOTED_FRAGMENTS = [expect_single_quoted_contents, expect_escape_sequence]
+_SQ_FAST_MATCH = re.compile(r"'([^'\n\\]*)'").match
+
 def expect_single_quoted_scalar(s: Source) -> tuple[str, Source]:
-    s = s.expect("'")
+    # fast path for strings without escape sequences
+    if (match := _SQ_FAST_MATCH(s.string, s.index)) is not None:
+        s.index = match.end()
+        return match.group(1), s
+    s = s.expect_char("'")
     frags = []
     frag: str
-    while not s.check("'"):
-        frag, s = first_valid(s, [expect_single_quoted_contents, expect_escape_sequence])
+    while not s.check_char("'"):
+        frag, s = first_valid(s, _SINGLE_QUOTED_FRAGMENTS)
         frags.append(frag)
-    return ''.join(frags), s.expect("'")
+    return ''.join(frags), s.expect_char("'")
+
+_SCALAR_ALTERNATIVES = [expect_single_quoted_scalar, expect_double_quoted_scalar, expect_plain_scalar]
 
+@memoized
 def expect_scalar(s: Source) -> tuple[ScalarNode, Source]:
-    scalar, snext = first_valid(s, [expect_single_quoted_scalar, expect_double_quoted_scalar, expect_plain_scalar])
-    return ScalarNode(s, scalar), snext
+    location = SourceLocation.from_source(s)
+    next_char = s.string[s.index:s.index + 1]
+    start = 0 if next_char == "'" else 1 if next_char == '"' else 2
+    scalar, s = first_valid_from(s, _SCALAR_ALTERNATIVES, start)
+    return ScalarNode(location, scalar), s
 
 def expect_value_scalar(s: Source) -> tuple[ScalarNode, Source]:
     value, s = expect_scalar(s)
     _, s = expect_comment(s)
     return value, s
 
-def expect_comment(s: Source, comment: re.Pattern[str] = re.compile(r'(#.*)?')) -> tuple[None, Source]:
-    _, s = s.match(comment)
+comment = re.compile(r'(#.*)?')
+_COMMENT_MATCH = comment.match
+def expect_comment(s: Source) -> tuple[None, Source]:
+    s.index = _COMMENT_MATCH(s.string, s.index).end()
     return None, s
 
-OPT_WHITESPACE = re.compile(r'[ \t]*')
 WHITESPACE = re.compile(r'[ \t]+')
+_WHITESPACE_MATCH = WHITESPACE.match
+
+# A document implicitly ends in a newline, so these also match at the end of the string.
+NEWLINES_RE = re.compile(r'(?:[ \t]*(?:#[^\n]*)?(?:\n|\Z))+')
+NEWLINES_OPT_RE = re.compile(r'(?:[ \t]*(?:#[^\n]*)?(?:\n|\Z))*')
+_NEWLINES_MATCH = NEWLINES_RE.match
+_NEWLINES_OPT_MATCH = NEWLINES_OPT_RE.match
+
+def _newlines_end(match_newlines: Callable[[str, int], re.Match[str] | None], s: Source) -> int | None:
+    # Index just past the newlines at s, or None. Reaching the end of the string means the
+    # implicit final newline was consumed too, which puts the index at len(s.string) + 1.
+    if s.index > s.length:
+        return None
+    match = match_newlines(s.string, s.index)
+    if match is None:
+        return None
+    end = match.end()
+    return end + 1 if end == s.length else end
 
-def expect_single_newline(s: Source) -> tuple[None, Source]:
-    _, s = s.match(OPT_WHITESPACE)
-    _, s = expect_comment(s)
-    s = s.expect('\n')
+def expect_newline(s: Source) -> tuple[None, Source]:
+    end = _newlines_end(_NEWLINES_MATCH, s)
+    if end is None:
+        s.fail('newline')
+    s.index = end
     return None, s
 
-def expect_newline(s: Source) -> tuple[None, Source]:
-    _, s = n_or_more(s, expect_single_newline, 1)
+def try_newline(s: Source) -> tuple[None, Source] | None:
+    end = _newlines_end(_NEWLINES_MATCH, s)
+    # nothing can follow a newline at the end of the document
+    if end is None or end > s.length:
+        return None
+    s.index = end
     return None, s
 
-def expect_sequence_item_sequence(s: Source, indentation: str) -> tuple[SequenceNode, Source]:
-    other_items: list[Node]
-    svalue = s = s.indent(indentation)
+def expect_optional_newlines(s: Source) -> tuple[None, Source]:
+    end = _newlines_end(_NEWLINES_OPT_MATCH, s)
+    if end is not None:
+        s.index = end
+    return None, s
+
+# expect_sequence_item_sequence and expect_sequence_item_mapping expect the
+# indentation of the sequence item to be pushed by expect_sequence_item_value
+def expect_sequence_item_sequence(s: Source) -> tuple[SequenceNode, Source]:
+    items: list[Node]
+    location = SourceLocation.from_source(s)
     item, s = expect_sequence_item(s)
-    other_items, s = n_or_more(s, compose([expect_newline, expect_indentation, expect_sequence_item], select=2), 0)
-    return SequenceNode(svalue, [item] + other_items), s.dedent()
+    items, s = zero_or_more(s, _SEQUENCE_TAIL, [item])
+    return SequenceNode(location, items), s
+
+def expect_sequence_item_mapping(s: Source) -> tuple[MappingNode, Source]:
+    items: list[tuple[str, Node]]
+    location = SourceLocation.from_source(s)
+    item, s = expect_mapping_item(s)
+    items, s = zero_or_more(s, _MAPPING_TAIL, [item])
+    return MappingNode(location, dict(items)), s
 
-def expect_sequence_item_mapping(s: Source, indentation: str) -> tuple[MappingNode, Source]:
-    other_items: list[tuple[str, Node]]
-    svalue = s = s.indent(indentation)
-    (k1, v1), s = expect_mapping_item(s)
-    other_items, s = n_or_more(s, compose([expect_newline, expect_indentation, expect_mapping_item], select=2), 0)
-    return MappingNode(svalue, {k1: v1} | {k: v for k, v in other_items}), s.dedent()
+_SEQUENCE_ITEM_VALUE_ALTERNATIVES = [expect_sequence_item_sequence, expect_sequence_item_mapping, expect_value_scalar]
 
 def expect_sequence_item_value(s: Source, indentation: str) -> tuple[Any, Source]:
-    return first_valid(s, [partial(expect_sequence_item_sequence, indentation=indentation), partial(expect_sequence_item_mapping, indentation=indentation), expect_value_scalar])
+    start = 0 if s.check_char('-') else 1
+    value, s = first_valid_from(s.indent(indentation), _SEQUENCE_ITEM_VALUE_ALTERNATIVES, start)
+    return value, s.dedent()
 
 def expect_sequence_item(s: Source) -> tuple[Node, Source]:
-    s = s.expect('-')
-    ws, s = s.match(WHITESPACE)
+    s = s.expect_char('-')
+    ws = _WHITESPACE_MATCH(s.string, s.index)
+    if ws is None:
+        s.fail(str(WHITESPACE))
+    s.index = ws.end()
     return expect_sequence_item_value(s, ' ' + ws.group())
 
+def try_sequence_item(s: Source) -> tuple[Node, Source] | None:
+    if not s.check_char('-'):
+        return None
+    return expect_sequence_item(s)
+
+_SEQUENCE_TAIL = try_compose([try_newline, try_indentation, try_sequence_item], select=2)
+
 def expect_sequence(s: Source) -> tuple[SequenceNode, Source]:
-    other_items: list[Node]
+    items: list[Node]
     _, s = expect_indentation(s)
-    svalue = s
+    location = SourceLocation.from_source(s)
     first_item, s = expect_sequence_item(s)
-    other_items, s = n_or_more(s, compose([expect_newline, expect_indentation, expect_sequence_item], select=2), 0)
-    return SequenceNode(svalue, [first_item] + other_items), s
+    items, s = zero_or_more(s, _SEQUENCE_TAIL, [first_item])
+    return SequenceNode(location, items), s
 
 def expect_scalar_mapping_value(s: Source) -> tuple[ScalarNode, Source]:
-    _, s = s.match(WHITESPACE)
+    ws = _WHITESPACE_MATCH(s.string, s.index)
+    if ws is None:
+        s.fail(str(WHITESPACE))
+    s.index = ws.end()
     return expect_value_scalar(s)
 
+def _peek_past_whitespace(s: Source) -> str:
+    index = _INDENT_MATCH(s.string, s.index).end()
+    return s.string[index:index + 1]
+
 def expect_complex_mapping_value(s: Source) -> tuple[Node, Source]:
     s = s.indent()
     _, s = expect_newline(s)
-    value, s = first_valid(s, [expect_sequence, expect_mapping])
+    # a sequence has to start with '-'
+    start = 0 if _peek_past_whitespace(s) == '-' else 1
+    value, s = first_valid_from(s, _BLOCK_ALTERNATIVES, start)
     return value, s.dedent()
 
+_MAPPING_VALUE_ALTERNATIVES = [expect_complex_mapping_value, expect_scalar_mapping_value]
+
 def expect_mapping_value(s: Source) -> tuple[Node, Source]:
-    return first_valid(s, [expect_complex_mapping_value, expect_scalar_mapping_value])
+    # A nested block has to be preceded by a newline, possibly after a comment. Both
+    # alternatives can match after '#', because a plain scalar may start with '##'.
+    start = 0 if _peek_past_whitespace(s) in ('\n', '#', '') else 1
+    return first_valid_from(s, _MAPPING_VALUE_ALTERNATIVES, start)
 
 def expect_mapping_item(s: Source) -> tuple[tuple[str, Node], Source]:
     key, s = expect_scalar(s)
-    s = s.expect(':')
+    s = s.expect_char(':')
     value, s = expect_mapping_value(s)
-    return (key.value, value), s
+    # keys tend to repeat throughout a document, so share one string per distinct key
+    return (sys.intern(key.value), value), s
+
+_MAPPING_TAIL = try_compose([try_newline, try_indentation, expect_mapping_item], select=2)
 
 def expect_mapping(s: Source) -> tuple[MappingNode, Source]:
-    other_items: list[tuple[str, Node]]
+    items: list[tuple[str, Node]]
     _, s = expect_indentation(s)
-    svalue = s
-    (k1, v1), s = expect_mapping_item(s)
-    other_items, s = n_or_more(s, compose([expect_newline, expect_indentation, expect_mapping_item], select=2), 0)
-    return MappingNode(svalue, {k1: v1} | {k: v for k, v in other_items}), s
+    location = SourceLocation.from_source(s)
+    first_item, s = expect_mapping_item(s)
+    items, s = zero_or_more(s, _MAPPING_TAIL, [first_item])
+    return MappingNode(location, dict(items)), s
+
+_BLOCK_ALTERNATIVES = [expect_sequence, expect_mapping]
+_VALUE_ALTERNATIVES = [expect_sequence, expect_mapping, expect_scalar]
 
 def expect_value(s: Source) -> tuple[Node, Source]:
-    return first_valid(s, [expect_sequence, expect_mapping, expect_scalar])
+    # at the top level, a sequence has to start with '-' right away
+    start = 0 if s.check_char('-') else 1
+    return first_valid_from(s, _VALUE_ALTERNATIVES, start)
 
 def expect_document(s: Source) -> tuple[Node, Source]:
-    _, s = n_or_more(s, expect_single_newline, 0)
+    _, s = expect_optional_newlines(s)
     value, s = expect_value(s)
-    _, s = n_or_more(s, expect_single_newline, 0)
+    _, s = expect_optional_newlines(s)
     return value, s
 
 
-def _parse(s: str) -> Node:
-    value, src = expect_document(Source(s))
-    if src.index < len(s):
+def parse(s: str) -> Node:
+    try:
+        value, src = expect_document(Source(s))
+    except KyssSyntaxError as e:
+        # the lazy union of expectations is only for backtracking, the error itself has a plain dict
+        if isinstance(e.expected, ExpectedUnion):
+            raise KyssSyntaxError(e.source, e.expected.merged()) from None
+        raise
+    # the document must be consumed up to and including its implicit final newline
+    if src.index <= len(s):
         src.fail('end of document')
     return value
-
-def parse(s: str) -> Node:
-    return _parse(s + '\n')
@@ -1,3 +1,4 @@
+import re
 from collections.abc import Callable, Iterator
 from dataclasses import dataclass, field
 from decimal import Decimal as PyDecimal
@@ -5,19 +6,34 @@ from decimal import InvalidOperation
 from typing import (Any, NotRequired, Required, Self, get_args, get_origin,
                     is_typeddict)
 
-from .ast import Node, ScalarNode
-from .errors import KyssSchemaError, SourceLocation
+from .ast import Node, ScalarNode, SequenceNode
+from .errors import KyssSchemaError, OrderedSet, SourceLocation
 
 
 class Schema:
     '''Base class for all schema builders. You can implement your own schema builder by subclassing ``Schema`` and overriding the ``validate`` method.'''
 
+    __slots__ = ()
+
+    #: The kinds of nodes this schema could accept. It rejects any node of another kind.
+    #: Override it together with ``validate``, otherwise it is assumed to be every kind.
+    accepts: frozenset[str] = frozenset({'scalar', 'sequence', 'mapping'})
+
     def validate(self, node: Node) -> Any:
         '''Validates its argument. If the argument is accepted, returns the value that should represent the data.
         If the argument is not accepted, raises :py:exc:`KyssSchemaError`.'''
 
         raise NotImplementedError
 
+    def try_validate(self, node: Node) -> tuple[bool, Any]:
+        '''Like ``validate``, but returns ``(True, value)`` if the argument is accepted and ``(False, error)`` if it is not, instead of raising the error.
+        Schemas that can reject values cheaply override this to avoid raising and catching exceptions.'''
+
+        try:
+            return True, self.validate(node)
+        except KyssSchemaError as e:
+            return False, e
+
     def __or__(self, other: 'Schema') -> 'Alternatives':
         return Alternatives([*self._get_alternatives(), *other._get_alternatives()])
 
@@ -35,19 +51,33 @@ class Schema:
 
         return Wrapper(self, fn, expected)
 
-@dataclass
+def _accepted_kinds(schema: Schema) -> frozenset[str]:
+    # A subclass that overrides validate but inherits accepts might accept other kinds of nodes,
+    # so only trust accepts if it was declared together with or after validate.
+    mro = type(schema).__mro__
+    accepts_owner = next(cls for cls in mro if 'accepts' in vars(cls))
+    validate_owner = next(cls for cls in mro if 'validate' in vars(cls))
+    if issubclass(accepts_owner, validate_owner):
+        return schema.accepts
+    return Schema.accepts
+
+@dataclass(slots=True)
 class Wrapper(Schema):
     schema: Schema
     fn: Callable[[Any], Any]
     expected: str | None = None
 
+    @property
+    def accepts(self) -> frozenset[str]:
+        return _accepted_kinds(self.schema)
+
     def validate(self, node: Node) -> Any:
         try:
             return self.fn(self.schema.validate(node))
         except (TypeError, ValueError) as e:
             raise node.error(self.expected or str(self.fn)) from e
 
-@dataclass
+@dataclass(slots=True)
 class Alternatives(Schema):
     '''``schema_1 | schema_2 | ... | schema_n`` <=> ``Alternatives([schema_1, schema_2, ..., schema_n])``
 
@@ -55,86 +85,181 @@ class Alternatives(Schema):
     Only fails if none of the alternatives accept it.'''
 
     alternatives: list[Schema]
+    _by_kind: dict[str, list[int]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _by_kind_for: list[Schema] | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def accepts(self) -> frozenset[str]:
+        return frozenset().union(*map(_accepted_kinds, self.alternatives))
 
     def validate(self, node: Node) -> Any:
-        exp = {}
-        for alternative in self.alternatives:
-            try:
-                return alternative.validate(node)
-            except KyssSchemaError as e:
-                exp |= e.expected
-        raise KyssSchemaError(node.location, exp)
+        alternatives = self.alternatives
+        if alternatives != self._by_kind_for:
+            # For each kind of node, the alternatives that are worth trying. The list can be changed,
+            # so this is built again whenever it no longer holds the same alternatives.
+            self._by_kind = {kind: [i for i, alternative in enumerate(alternatives) if kind in _accepted_kinds(alternative)]
+                             for kind in Schema.accepts}
+            self._by_kind_for = list(alternatives)
+        failed: list[Any] = [None] * len(alternatives)
+        for i in self._by_kind[node.kind]:
+            ok, result = alternatives[i].try_validate(node)
+            if ok:
+                return result
+            failed[i] = result.expected
+        # The other alternatives reject this node anyway, but the error should list what they expected.
+        for i, alternative in enumerate(alternatives):
+            if failed[i] is None:
+                ok, result = alternative.try_validate(node)
+                if ok:
+                    return result
+                failed[i] = result.expected
+        expected: OrderedSet = {}
+        for part in failed:
+            expected |= part
+        raise KyssSchemaError(node.location, expected)
 
     def _get_alternatives(self) -> Iterator[Schema]:
         yield from self.alternatives
 
-@dataclass
-class Str(Schema):
-    'Accepts any scalar and produces it unchanged.'
+class _Stateless(Schema):
+    '''Base class for the built-in schemas without parameters. There is only ever one instance of each of those classes.
+    Subclasses can still have parameters, so they get a new instance every time.'''
+
+    __slots__ = ()
+
+    def __new__(cls, *args: Any, **kwargs: Any) -> Self:
+        if not args and not kwargs:
+            try:
+                return _SHARED_INSTANCES[cls]
+            except KeyError:
+                pass
+        return super().__new__(cls)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}()'
+
+    # equal like the dataclasses these used to be: instances without parameters are interchangeable
+    def __eq__(self, other: object) -> bool:
+        if type(self) is type(other):
+            return True
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(type(self))
+
+# filled in once the built-in classes are defined, at the end of this module
+_SHARED_INSTANCES: dict[type[Schema], Schema] = {}
+
+class _Scalar(_Stateless):
+    '''Base class for the built-in scalar schemas. Subclasses implement ``_validate_or_error``, which returns the error instead of raising it.'''
+
+    __slots__ = ()
+
+    accepts = frozenset({'scalar'})
+
+    def _validate_or_error(self, node: Node) -> Any:
+        raise NotImplementedError
 
     def validate(self, node: Node) -> Any:
-        node.require_scalar()
-        return node.value
+        result = self._validate_or_error(node)
+        if type(result) is KyssSchemaError:
+            raise result
+        return result
+
+    def try_validate(self, node: Node) -> tuple[bool, Any]:
+        if type(self).validate is not _Scalar.validate:
+            # a subclass customized validate, so that has to be called
+            return super().try_validate(node)
+        result = self._validate_or_error(node)
+        return type(result) is not KyssSchemaError, result
+
+class Str(_Scalar):
+    'Accepts any scalar and produces it unchanged.'
 
-@dataclass
-class Bool(Schema):
+    __slots__ = ()
+
+    def _validate_or_error(self, node: Node) -> Any:
+        if type(node) is ScalarNode or node.kind == 'scalar':
+            return node.value
+        return node.error('scalar')
+
+_BOOL_VALUES = {'true': True, 'True': True, 'TRUE': True, 'false': False, 'False': False, 'FALSE': False}
+
+class Bool(_Scalar):
     "Accepts scalars that case-insensitively equal to 'true' or 'false'. Produces a ``bool``."
 
-    def validate(self, node: Node) -> Any:
-        if node.kind == 'scalar':
-            v = node.value.lower()
-            if v == 'true':
-                return True
-            elif v == 'false':
-                return False
-        raise node.error('true or false')
+    __slots__ = ()
 
-@dataclass
-class Int(Schema):
-    'Accepts scalars that Python can interpret as integers. Produces an ``int``.'
+    def _validate_or_error(self, node: Node) -> Any:
+        if type(node) is ScalarNode or node.kind == 'scalar':
+            v = node.value
+            # only lowercase the unusual spellings, and only if they have the right length
+            result = _BOOL_VALUES.get(v)
+            if result is None and len(v) in (4, 5):
+                result = _BOOL_VALUES.get(v.lower())
+            if result is not None:
+                return result
+        return node.error('true or false')
 
-    def validate(self, node: Node) -> Any:
-        if node.kind == 'scalar':
-            try:
-                return int(node.value)
-            except ValueError:
-                pass
-        raise node.error('integer')
+class Int(_Scalar):
+    'Accepts scalars that Python can interpret as integers. Produces an ``int``.'
 
-@dataclass
-class Float(Schema):
+    __slots__ = ()
+
+    def _validate_or_error(self, node: Node) -> Any:
+        if type(node) is ScalarNode or node.kind == 'scalar':
+            v = node.value
+            digits = v[1:] if v[:1] in ('+', '-') else v
+            # Besides digits, int() only accepts surrounding whitespace and underscores,
+            # so anything else can be rejected without raising and catching a ValueError.
+            if digits.isdecimal() or '_' in v or v[:1].isspace() or v[-1:].isspace():
+                try:
+                    return int(v)
+                except ValueError:
+                    pass
+        return node.error('integer')
+
+# Every string that float() or decimal.Decimal() accepts contains a digit, infinity or nan.
+_could_be_number = re.compile(r'\d|inf|nan', re.IGNORECASE).search
+
+class Float(_Scalar):
     'Accepts scalars that Python can interpret as floating point numbers. Produces a ``float``.'
 
-    def validate(self, node: Node) -> Any:
-        if node.kind == 'scalar':
+    __slots__ = ()
+
+    def _validate_or_error(self, node: Node) -> Any:
+        if (type(node) is ScalarNode or node.kind == 'scalar') and _could_be_number(node.value):
             try:
                 return float(node.value)
             except ValueError:
                 pass
-        raise node.error('floating point number')
+        return node.error('floating point number')
 
 
-@dataclass
-class Decimal(Schema):
+class Decimal(_Scalar):
     'Accepts scalars that Python can interpret as a decimal number. Produces a ``decimal.Decimal``.'
 
-    def validate(self, node: Node) -> Any:
-        if node.kind == 'scalar':
+    __slots__ = ()
+
+    def _validate_or_error(self, node: Node) -> Any:
+        if (type(node) is ScalarNode or node.kind == 'scalar') and _could_be_number(node.value):
             try:
                 return PyDecimal(node.value)
             except InvalidOperation:
                 pass
-        raise node.error('decimal number')
+        return node.error('decimal number')
 
-@dataclass
+@dataclass(slots=True)
 class List(Schema):
     'Accepts sequences where each item is accepted by the ``item`` schema. Produces a ``list``.'
 
     item: Schema
 
+    accepts = frozenset({'sequence'})
+
     def validate(self, node: Node) -> Any:
         node.require_sequence()
-        return [self.item.validate(item) for item in node.children]
+        return list(map(self.item.validate, node.children))
 
 @dataclass
 class Dict(Schema):
@@ -148,25 +273,78 @@ class Dict(Schema):
     values: Schema | None = None
     optional: dict[str, Schema] | None = field(default=None, kw_only=True)
 
-    def validate(self, node: Node) -> Any:
-        node.require_mapping()
-        v = node.children
-        if missing_keys := self.required.keys() - v.keys():
-            raise node.error(f'a mapping that has the keys {sorted(self.required)}')
-        unspecified_keys = v.keys() - self.required.keys()
-        if self.optional is not None:
-            unspecified_keys -= self.optional.keys()
-        if unspecified_keys and self.values is None:
-            keys = sorted([*self.required, *(self.optional or ())])
-            raise node.error(f'a mapping that only has the keys {keys}')
-        specified = {key: schema.validate(v[key]) for key, schema in self.required.items()}
-        if self.optional is not None:
-            specified |= {key: schema.validate(v[key]) for key, schema in self.optional.items() if key in v}
-        if unspecified_keys and self.values is not None:
-            return specified | {key: self.values.validate(v[key]) for key in unspecified_keys}
-        return specified
+    accepts = frozenset({'mapping'})
 
-@dataclass
+    def __post_init__(self) -> None:
+        self._compiled: Callable[[Node], Any] | None = None
+        self._compiled_for: tuple[dict[str, Schema], dict[str, Schema] | None, Schema | None] | None = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # generated functions can't be pickled, and are cheap to generate again
+        return self.__dict__ | {'_compiled': None, '_compiled_for': None}
+
+    def validate(self, node: Node) -> Any:
+        # The fields can be changed, also in place, so check that they still are what the validator was generated for.
+        # Comparing with the snapshot is cheap as long as they hold the same schema objects.
+        if (self.required, self.optional, self.values) != self._compiled_for:
+            self._compiled = self._compile()
+            self._compiled_for = (dict(self.required), None if self.optional is None else dict(self.optional), self.values)
+        return self._compiled(node)
+
+    def _compile(self) -> Callable[[Node], Any]:
+        # Generates straight-line code for this specific set of keys, instead of doing
+        # set arithmetic and looping over the schemas for every mapping validated.
+        # The unspecified keys are found by counting the specified keys that are present.
+        specified_keys = frozenset(self.required) | frozenset(self.optional or ())
+        namespace: dict[str, Any] = {'ScalarNode': ScalarNode,
+                                     'specified_keys': specified_keys,
+                                     'missing_keys_message': f'a mapping that has the keys {sorted(self.required)}',
+                                     'unspecified_keys_message': f'a mapping that only has the keys {sorted([*self.required, *(self.optional or ())])}'}
+        def validated(kind: str, i: int, schema: Schema) -> str:
+            node = f'v[{kind}_key_{i}]'
+            if type(schema) is Str:
+                # inlined to save a call per field: Str produces the value of any scalar
+                return f"({kind}_node_{i}.value if type({kind}_node_{i} := {node}) is ScalarNode else validate_{kind}_{i}({kind}_node_{i}))"
+            return f'validate_{kind}_{i}({node})'
+
+        lines = ['def validate(node):',
+                 '    node.require_mapping()',
+                 '    v = node.children']
+        required = []
+        for i, (key, schema) in enumerate(self.required.items()):
+            namespace[f'required_key_{i}'] = key
+            namespace[f'validate_required_{i}'] = schema.validate
+            required.append(i)
+        if required:
+            lines += ['    if ' + ' or '.join(f'required_key_{i} not in v' for i in required) + ':',
+                      '        raise node.error(missing_keys_message)']
+        optional = []
+        for i, (key, schema) in enumerate((self.optional or {}).items()):
+            namespace[f'optional_key_{i}'] = key
+            namespace[f'validate_optional_{i}'] = schema.validate
+            optional.append(i)
+        # an optional key that is also required is always present
+        counted = [f'(optional_key_{i} in v)' for i, key in zip(optional, self.optional or ()) if key not in self.required]
+        found = ' + '.join([str(len(required)), *counted])
+        if self.values is None:
+            lines += [f'    if len(v) > {found}:',
+                      '        raise node.error(unspecified_keys_message)']
+        lines.append('    result = {' + ', '.join(f'required_key_{i}: {validated("required", i, schema)}'
+                                                for i, schema in zip(required, self.required.values())) + '}')
+        for i, schema in zip(optional, (self.optional or {}).values()):
+            lines += [f'    if optional_key_{i} in v:',
+                      f'        result[optional_key_{i}] = {validated("optional", i, schema)}']
+        if self.values is not None:
+            namespace['validate_value'] = self.values.validate
+            lines += ['    if len(v) > len(result):',
+                      '        for key, value in v.items():',
+                      '            if key not in specified_keys:',
+                      '                result[key] = validate_value(value)']
+        lines.append('    return result')
+        exec('\n'.join(lines), namespace)
+        return namespace['validate']
+
+@dataclass(slots=True)
 class ListOrSingle(Schema):
     '''Accepts either a sequence where each item is accepted by ``item`` or a non-sequence value that is accepted by ``item``. Always produces a ``list``, regardless.
 
@@ -174,12 +352,16 @@ class ListOrSingle(Schema):
 
     item: Schema
 
+    @property
+    def accepts(self) -> frozenset[str]:
+        return _accepted_kinds(self.item) | {'sequence'}
+
     def validate(self, node: Node) -> Any:
-        if node.kind == 'sequence':
-            return [self.item.validate(item) for item in node.children]
+        if type(node) is SequenceNode or node.kind == 'sequence':
+            return list(map(self.item.validate, node.children))
         return [self.item.validate(node)]
 
-@dataclass
+@dataclass(slots=True)
 class CommaSeparated(Schema):
     '''Accepts a scalar, splits it on commas. Produces a ``list``.
 
@@ -188,19 +370,39 @@ class CommaSeparated(Schema):
 
     item: Schema
 
+    accepts = frozenset({'scalar'})
+
     def validate(self, node: Node) -> Any:
         node.require_scalar()
-        return [self.item.validate(ScalarNode(node.location, item)) for item in node.value.split(',')]
+        items = node.value.split(',')
+        if type(self.item) is Str:
+            return items  # the pieces are the result already, no need to copy them
+        convert = _CONVERTERS.get(type(self.item))
+        if convert is not None:
+            try:
+                return list(map(convert, items))
+            except ValueError:
+                pass  # validate them one by one, to report which one is wrong
+        validate_item = self.item.validate
+        location = node.location
+        return [validate_item(ScalarNode(location, item)) for item in items]
 
-@dataclass
-class Accept(Schema):
+# For these schemas, validating a scalar is the same as calling the converter on its value,
+# so CommaSeparated can convert all the items without creating a node for each of them.
+_CONVERTERS: dict[type[Schema], Callable[[str], Any]] = {Int: int, Float: float}
+
+class Accept(_Stateless):
     '''Accepts any value and produces it unchanged.'''
 
+    __slots__ = ()
+
     def validate(self, node: Node) -> Any:
-        if node.kind == 'scalar':
+        if type(node) is ScalarNode or node.kind == 'scalar':
             return node.value
-        elif node.kind == 'sequence':
+        elif type(node) is SequenceNode or node.kind == 'sequence':
             return [self.validate(item) for item in node.children]
         elif node.kind == 'mapping':
             return {key: self.validate(value) for key, value in node.children.items()}
         assert False  # unreachable
+
+_SHARED_INSTANCES.update((cls, object.__new__(cls)) for cls in (Str, Bool, Int, Float, Decimal, Accept))
@@ -1,17 +1,34 @@
-from collections.abc import Iterable
+import os
+from collections.abc import Callable, Container, Mapping
 from decimal import Decimal as PyDecimal
 from inspect import get_annotations
 from os import PathLike
-from pathlib import Path
-from types import UnionType
+from types import MappingProxyType, UnionType
 from typing import (Any, NotRequired, Required, TypeAliasType, get_args,
                     get_origin, is_typeddict)
+from weakref import WeakKeyDictionary
 
 from .recursive_descent import parse
 from .schema import (Accept, Alternatives, Bool, CommaSeparated, Decimal, Dict,
                      Float, Int, List, ListOrSingle, Schema, Str)
 
 
+def _read_text(f: PathLike[str]) -> str:
+    # Reads the whole file with as few system calls as possible, avoiding the
+    # overhead of a TextIOWrapper. The size is only a hint: it is 0 for pipes
+    # and some special files, so keep reading until the end of the file.
+    # O_BINARY only exists on Windows, where text mode would stop reading at a Ctrl-Z
+    fd = os.open(f, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        chunks = [os.read(fd, os.fstat(fd).st_size + 1)]
+        while chunks[-1]:
+            chunks.append(os.read(fd, 65536))
+    finally:
+        os.close(fd)
+    # universal newlines, like text mode
+    return b''.join(chunks).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
 class list_or_single[T](list[T]):
     pass
 
@@ -22,19 +39,31 @@ class comma_separated[T](list[T]):
 
 class SchemaRegistry:
     def __init__(self) -> None:
-        self.schema_builders = {bool: Bool, str: Str, int: Int, float: Float,
-                                PyDecimal: Decimal, Any: Accept,
-                                list_or_single: ListOrSingle,
-                                comma_separated: CommaSeparated}
+        self._schema_builders: dict[Any, Callable[..., Schema]] = {
+            bool: Bool, str: Str, int: Int, float: Float,
+            PyDecimal: Decimal, Any: Accept,
+            list_or_single: ListOrSingle,
+            comma_separated: CommaSeparated}
+        # Weakly keyed, so TypedDicts that are thrown away, like the ones that
+        # schema_file creates for every schema it reads, don't pile up.
+        self._typeddict_cache: WeakKeyDictionary[type, Schema] = WeakKeyDictionary()
+
+    @property
+    def schema_builders(self) -> Mapping[Any, Callable[..., Schema]]:
+        '''A read-only view of the registered types. Use :py:meth:`register_type` to change them.'''
+
+        return MappingProxyType(self._schema_builders)
 
-    def _mapping_specified(self, value_types: dict[str, type], keys: Iterable[str]) -> dict[str, Schema]:
-        return {key: self.to_schema(value_types[key]) for key in keys if key != '_extra_'}
+    def _mapping_specified(self, value_types: dict[str, type], keys: Container[str]) -> dict[str, Schema]:
+        # in the order the keys are declared, rather than the arbitrary order of the frozenset
+        return {key: self.to_schema(value_type) for key, value_type in value_types.items() if key in keys and key != '_extra_'}
 
     def register_type(self, type_: type, schema_builder: type[Schema]) -> None:
         '''Add or override a type. After ``registry.register_type(MyType, MySchema)``,
         ``registry.to_schema(MyType)`` → ``MySchema()`` and ``registry.to_schema(MyType[A, B])`` → ``MySchema(registry.to_schema(A), registry.to_schema(B))``.'''
 
-        self.schema_builders[type_] = schema_builder
+        self._schema_builders[type_] = schema_builder
+        self._typeddict_cache.clear()
 
     def to_schema(self, type_schema: type | Schema) -> Schema:
         r'''Interpret a type as a schema. Called by :py:func:`parse_string` and :py:func:`parse_file`.
@@ -75,13 +104,26 @@ class SchemaRegistry:
 
             - ``registry.to_schema(Employee)`` → :class:`kyss.Dict`\ ``({'id':`` :class:`kyss.Int`\ ``()},`` :class:`kyss.Bool`\ ``(), optional={'department':`` :class:`kyss.Str`\ ``()})``
 
+        The schema for a TypedDict is built once and then shared by every call with that TypedDict, so don't modify it.
+
         '''
         if isinstance(type_schema, Schema):
             return type_schema
+        if type(type_schema) is type and type_schema in self._schema_builders:
+            # Plain classes like str and int hash by identity, so this lookup is cheap.
+            return self._schema_builders[type_schema]()
+        if is_typeddict(type_schema):
+            schema = self._typeddict_cache.get(type_schema)
+            if schema is None:
+                schema = self._typeddict_cache[type_schema] = self._build_schema(type_schema)
+            return schema
+        return self._build_schema(type_schema)
+
+    def _build_schema(self, type_schema: type) -> Schema:
         if isinstance(type_schema, TypeAliasType):
             return self.to_schema(type_schema.__value__)
-        if type_schema in self.schema_builders:
-            return self.schema_builders[type_schema]()
+        if type_schema in self._schema_builders:
+            return self._schema_builders[type_schema]()
         if is_typeddict(type_schema):
             value_types = get_annotations(type_schema)
             required: frozenset[str] = type_schema.__required_keys__  # type: ignore
@@ -96,8 +138,8 @@ class SchemaRegistry:
             return Alternatives([self.to_schema(alt) for alt in get_args(type_schema)])
         elif isinstance(origin, TypeAliasType):
             return self.to_schema(origin.__value__[get_args(type_schema)])
-        elif origin in self.schema_builders:
-            return self.schema_builders[origin](*map(self.to_schema, get_args(type_schema)))
+        elif origin in self._schema_builders:
+            return self._schema_builders[origin](*map(self.to_schema, get_args(type_schema)))
         elif origin is list:
             return List(self.to_schema(get_args(type_schema)[0]))
         elif origin is dict:
@@ -122,10 +164,11 @@ class SchemaRegistry:
         :param f: a os.PathLike for the file name
         :param schema: optional schema to use'''
 
-        return self.parse_string(Path(f).read_text(encoding='utf-8'), schema)
+        return self.parse_string(_read_text(f), schema)
 
 
 default_registry = SchemaRegistry()
 
 parse_string = default_registry.parse_string
-parse_file = default_registry.parse_file
\ No newline at end of file
+parse_file = default_registry.parse_file
+to_schema = default_registry.to_schema
\ No newline at end of file
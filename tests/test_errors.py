@@ -1,4 +1,5 @@
 import pytest
+import json
 
 import kyss
 
@@ -49,3 +50,42 @@ def test_unclosed():
     assert str(exc.value) == '''Expected one of {'-', "'", double quoted string contents, escape sequence, plain scalar} at line 1:
 "unclosed double quoted string
 ^'''
+
+
+def test_expected_union():
+    from kyss.errors import ExpectedUnion, ordered_set
+    union = ExpectedUnion([ordered_set('a'), ExpectedUnion([ordered_set('b'), ordered_set('a')]), {'c': None}])
+    assert list(union) == ['a', 'b', 'c']
+    assert 'b' in union
+    assert {} | union == {'a': None, 'b': None, 'c': None}
+
+def test_no_line_info_while_parsing(monkeypatch):
+    def get_line_info(self):
+        raise AssertionError('get_line_info called while parsing')
+    monkeypatch.setattr(kyss.errors.SourceLocation, 'get_line_info', get_line_info)
+    assert kyss.parse_string('- a\n- - b\n  - c: d\n    e:\n        - f\n') == ['a', ['b', {'c': 'd', 'e': ['f']}]]
+
+def test_long_line_truncated():
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string(','.join(['1'] * 300 + ['x'] + ['1'] * 300), kyss.Int())
+    message = str(exc.value)
+    assert len(message) < 500
+    assert message.startswith('Expected integer at line 1:\n1,1,')
+    assert message.endswith('...\n^')
+
+def test_line_info_not_kept_globally():
+    with pytest.raises(kyss.KyssSyntaxError) as exc:
+        kyss.parse_string('a: b\n: c')
+    location = exc.value.source
+    assert str(exc.value).endswith('at line 2:\n: c\n^')
+    assert '_line_starts' in vars(location)
+    assert kyss.errors.SourceLocation(location.string, location.index).get_line_info() == location.get_line_info()
+
+def test_expected_is_plain_dict():
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('x', kyss.Int() | kyss.Bool())
+    assert type(exc.value.expected) is dict
+    assert json.dumps(exc.value.expected) == '{"integer": null, "true or false": null}'
+    with pytest.raises(kyss.KyssSyntaxError) as exc:
+        kyss.parse_string('a: b\n: c')
+    assert type(exc.value.expected) is dict
\ No newline at end of file
@@ -18,4 +18,27 @@ def test_read_file():
     with NamedTemporaryFile('w+', encoding='utf-8', delete_on_close=False) as tmp:
         tmp.write('ok\n')
         tmp.close()
-        assert kyss.parse_file(tmp.name) == 'ok'
\ No newline at end of file
+        assert kyss.parse_file(tmp.name) == 'ok'
+
+def test_first_valid_restores_source():
+    def expect_xy(s: Source) -> tuple[None, Source]:
+        s = s.indent(' ')
+        return None, s.expect('x').expect('y')
+    def expect_x(s: Source) -> tuple[str, Source]:
+        return 'x', s.expect('x')
+    value, s = kyss.recursive_descent.first_valid(Source('xz'), [expect_xy, expect_x])
+    assert value == 'x'
+    assert s.index == 1
+    assert s.indentation == ['']
+
+def test_read_file_crlf():
+    with NamedTemporaryFile('wb', delete_on_close=False) as tmp:
+        tmp.write(b'- one\r\n- two\r\n')
+        tmp.close()
+        assert kyss.parse_file(tmp.name) == ['one', 'two']
+
+def test_read_file_ctrl_z():
+    with NamedTemporaryFile('wb', delete_on_close=False) as tmp:
+        tmp.write(b'- "a\x1a"\n- b\n')
+        tmp.close()
+        assert kyss.parse_file(tmp.name) == ['a\x1a', 'b']
\ No newline at end of file
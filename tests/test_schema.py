@@ -1,7 +1,10 @@
 import pytest
 import decimal
+import pickle
+from dataclasses import dataclass
 
 import kyss
+import kyss.recursive_descent
 
 def test_simple_schema():
     assert kyss.parse_string('42', kyss.Int()) == 42
@@ -110,4 +113,139 @@ def test_parse_needs_implementing():
 def test_wrapper_validates():
     with pytest.raises(kyss.KyssSchemaError) as exc:
         kyss.parse_string('3a', kyss.Str().wrap_in(int, 'integer'))
-    assert 'integer' in exc.value.expected
\ No newline at end of file
+    assert 'integer' in exc.value.expected
+
+def test_mapping_optional_and_unspecified():
+    schema = kyss.Dict({'a': kyss.Int()}, optional={'b': kyss.Bool(), 'c': kyss.Str()})
+    assert kyss.parse_string('a: 1\nc: x', schema) == {'a': 1, 'c': 'x'}
+    assert kyss.parse_string('a: 1\nb: false\nc: x', schema) == {'a': 1, 'b': False, 'c': 'x'}
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('a: 1\nd: x', schema)
+    assert exc.value.expected == {"a mapping that only has the keys ['a', 'b', 'c']": None}
+
+def test_int_like_python():
+    assert kyss.parse_string('"-1_000 "', kyss.Int()) == -1000
+    assert kyss.parse_string('+٣', kyss.Int()) == 3
+    with pytest.raises(kyss.KyssSchemaError):
+        kyss.parse_string('²', kyss.Int())
+    with pytest.raises(kyss.KyssSchemaError):
+        kyss.parse_string('+-1', kyss.Int())
+
+def test_stateless_schemas_are_shared():
+    assert kyss.Int() is kyss.Int()
+    assert kyss.Str() is not kyss.Accept()
+    assert repr(kyss.Int() | kyss.Str()) == 'Alternatives(alternatives=[Int(), Str()])'
+
+def test_comma_separated_invalid_item():
+    assert kyss.parse_string('1, 2,3', kyss.CommaSeparated(kyss.Int())) == [1, 2, 3]
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('1,2,x', kyss.CommaSeparated(kyss.Int()))
+    assert exc.value.expected == {'integer': None}
+
+def test_alternatives_by_kind():
+    schema = kyss.List(kyss.Int()) | kyss.Dict({}, kyss.Int()) | kyss.Int().wrap_in(str)
+    assert kyss.parse_string('- 1', schema) == [1]
+    assert kyss.parse_string('a: 1', schema) == {'a': 1}
+    assert kyss.parse_string('1', schema) == '1'
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('x', schema)
+    assert list(exc.value.expected) == ['sequence', 'mapping', 'integer']
+
+def test_bool_case_insensitive():
+    assert kyss.parse_string('- true\n- FALSE\n- tRuE\n- False', kyss.List(kyss.Bool())) == [True, False, True, False]
+
+def test_try_validate():
+    node = kyss.recursive_descent.parse('x')
+    assert kyss.Str().try_validate(node) == (True, 'x')
+    ok, error = kyss.Int().try_validate(node)
+    assert not ok
+    assert error.expected == {'integer': None}
+    ok, error = kyss.List(kyss.Int()).try_validate(node)
+    assert not ok
+    assert error.expected == {'sequence': None}
+
+class Port(kyss.Int):
+    def validate(self, node):
+        value = super().validate(node)
+        if not 0 <= value < 65536:
+            raise node.error('port number')
+        return value
+
+class Upper(kyss.Str):
+    def validate(self, node):
+        return super().validate(node).upper()
+
+def test_alternatives_use_overridden_validate():
+    assert kyss.parse_string('70000', Port() | kyss.Str()) == '70000'
+    assert kyss.parse_string('80', Port() | kyss.Str()) == 80
+    assert kyss.parse_string('abc', Upper() | kyss.Int()) == 'ABC'
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('70000', Port() | kyss.Bool())
+    assert list(exc.value.expected) == ['port number', 'true or false']
+
+@dataclass
+class Range(kyss.Int):
+    lo: int
+    hi: int
+
+    def validate(self, node):
+        value = super().validate(node)
+        if not self.lo <= value <= self.hi:
+            raise node.error(f'integer from {self.lo} to {self.hi}')
+        return value
+
+class Prefixed(kyss.Str):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def validate(self, node):
+        return self.prefix + super().validate(node)
+
+def test_subclasses_with_parameters():
+    assert Range(0, 10) is not Range(0, 10)
+    assert Range(0, 10) == Range(0, 10)
+    assert kyss.parse_string('5', Range(0, 10)) == 5
+    with pytest.raises(kyss.KyssSchemaError):
+        kyss.parse_string('50', Range(0, 10))
+    assert kyss.parse_string('- a\n- b', kyss.List(Prefixed('x') | Prefixed('y'))) == ['xa', 'xb']
+    assert Prefixed('x').prefix == 'x' and Prefixed('y').prefix == 'y'
+    assert Port() is not Port()
+    assert Port() == Port()
+    assert kyss.Dict({'a': Port()}) == kyss.Dict({'a': Port()})
+    assert Port() != kyss.Int()
+
+def test_mapping_schema_changed_after_use():
+    schema = kyss.Dict({'a': kyss.Int()})
+    assert kyss.parse_string('a: 1', schema) == {'a': 1}
+    schema.required['b'] = kyss.Int()
+    with pytest.raises(kyss.KyssSchemaError) as exc:
+        kyss.parse_string('a: 1', schema)
+    assert exc.value.expected == {"a mapping that has the keys ['a', 'b']": None}
+    schema.values = kyss.Str()
+    assert kyss.parse_string('a: 1\nb: 2\nc: 3', schema) == {'a': 1, 'b': 2, 'c': '3'}
+    schema.optional = {'c': kyss.Int()}
+    assert kyss.parse_string('a: 1\nb: 2\nc: 3', schema) == {'a': 1, 'b': 2, 'c': 3}
+
+def test_pickle_mapping_schema():
+    schema = kyss.Dict({'a': kyss.Int()}, kyss.Str())
+    assert kyss.parse_string('a: 1\nb: 2', schema) == {'a': 1, 'b': '2'}
+    copy = pickle.loads(pickle.dumps(schema))
+    assert copy == schema
+    assert kyss.parse_string('a: 1\nb: 2', copy) == {'a': 1, 'b': '2'}
+
+class Joined(kyss.Str):
+    def validate(self, node):
+        if node.kind == 'sequence':
+            return ' '.join(super(Joined, self).validate(item) for item in node.children)
+        return super().validate(node)
+
+def test_alternatives_with_inherited_accepts():
+    schema = Joined() | kyss.List(kyss.Str())
+    assert kyss.parse_string('- a\n- b', schema) == 'a b'
+    assert kyss.parse_string('- a\n- b', kyss.ListOrSingle(Joined()) | kyss.List(kyss.Str())) == ['a', 'b']
+
+def test_alternatives_changed_after_use():
+    schema = kyss.Int() | kyss.List(kyss.Int())
+    assert kyss.parse_string('- 1', schema) == [1]
+    schema.alternatives[0] = kyss.List(kyss.Str())
+    assert kyss.parse_string('- 1', schema) == ['1']
\ No newline at end of file
@@ -45,3 +45,8 @@ def test_comments_in_map():
     assert kyss.parse_string(r'''outer: # comment
     inner: okay
 ''') == {'outer': {'inner': 'okay'}}
+
+def test_plain_scalar_trailing_whitespace():
+    assert kyss.parse_string('a: b \t # comment\nc: d\t\n') == {'a': 'b', 'c': 'd'}
+    assert kyss.parse_string('- x#y \n- p:q ') == ['x#y', 'p:q']
+    assert kyss.parse_string('a: b\r\nc: d\r\n') == {'a': 'b', 'c': 'd'}
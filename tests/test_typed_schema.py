@@ -1,4 +1,5 @@
 import pytest
+import gc
 import decimal
 from typing import NotRequired, TypedDict
 
@@ -73,4 +74,36 @@ def test_registry():
 - 3
 - 1
 - 2
-- 1''', set[int]) == {1, 2, 3}
\ No newline at end of file
+- 1''', set[int]) == {1, 2, 3}
+
+def test_schema_cache():
+    reg = kyss.SchemaRegistry()
+    assert reg.to_schema(Simple) is reg.to_schema(Simple)
+    assert reg.to_schema(int_or_bool) == reg.to_schema(int_or_bool)
+    assert reg.to_schema(bool | int) == kyss.Bool() | kyss.Int()
+    reg.register_type(int, lambda: kyss.Str())
+    assert reg.to_schema(Simple).required == {'a': kyss.Str()}
+
+class Ordered(TypedDict):
+    z: int
+    y: str
+    x: NotRequired[bool]
+    w: NotRequired[int]
+
+def test_mapping_keys_in_declared_order():
+    schema = kyss.SchemaRegistry().to_schema(Ordered)
+    assert list(schema.required) == ['z', 'y']
+    assert list(schema.optional) == ['x', 'w']
+
+def test_schema_cache_does_not_keep_typed_dicts():
+    reg = kyss.SchemaRegistry()
+    for _ in range(10):
+        reg.to_schema(TypedDict('T', {'a': int}))
+    gc.collect()
+    assert len(reg._typeddict_cache) == 0
+
+def test_schema_builders_read_only():
+    reg = kyss.SchemaRegistry()
+    assert reg.schema_builders[int] is kyss.Int
+    with pytest.raises(TypeError):
+        reg.schema_builders[int] = kyss.Str
\ No newline at end of file